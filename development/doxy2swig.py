@@ -25,15 +25,19 @@ are where the output interface and latex files will be written.
 
 # Reference links (may be obsolete soon):
 #
-#    XML DOM in general: http://www.w3schools.com/dom/default.asp
-#        Note that Element and Text class names. This file does
-#        not handle Attribute class.
-#    Python minidom: http://docs.python.org/lib/module-xml.dom.minidom.html
+#    ElementTree: https://docs.python.org/3/library/xml.etree.elementtree.html
+#        Text of an element is stored in its text attribute, and text
+#        after it (before its next sibling) in its tail attribute.
+#    lxml: https://lxml.de/
 #
 
-
-from xml.dom import minidom
-import re, textwrap, sys, types, os.path, inspect
+try:
+    # lxml parses with libxml2 and is much faster than the standard library
+    from lxml import etree
+except ImportError:
+    import xml.etree.ElementTree as etree
+import re, textwrap, sys, os.path, inspect, io
+from operator import itemgetter
 from pydoc import *
 
 from docutils import core
@@ -54,7 +58,7 @@ except:
 # customized latex output
 class myLaTeXTranslator(LaTeXTranslator):
     def visit_definition_list(self, node):
-        self.body.append( '\n{\leftskip 0.3in \parindent=-0.3in ' )
+        self.body.append( '\n{\\leftskip 0.3in \\parindent=-0.3in ' )
 
     def depart_definition_list(self, node):
         self.body.append( '\\par}\n' )
@@ -114,37 +118,85 @@ class Doxy2SWIG:
     Docstrings that can be used by SWIG-1.3.x that have support for
     feature("docstring").
     """
+    # characters that latex_text escapes outside of math formulas
+    latex_escapes = dict([(ord(x), '\\' + x) for x in '\\&$~%#_{}^'])
+    # delimiters of in-text and displayed math formulas
+    latex_math_re = re.compile(r'\$|\\\[|\\\]')
+    # tags in self.content and their latex form
+    latex_tags = {
+        '<em>': r'{\em ', '</em>': '}',
+        '<tt>': r'{\tt ', '</tt>': '}',
+        '<bf>': r'{\bf ', '</bf>': '}',
+        '</newline>': '\n\n',
+        '<itemize>': r'\begin{itemize} ', '</itemize>': r'\end{itemize}',
+        '<item>': r'\item ', '</item>': ' ',
+        '>': '>{}',
+    }
+    latex_tags_re = re.compile('|'.join([re.escape(x) for x in latex_tags]))
+    # C++ default values of arguments and their Python form, vectorXXX
+    # are written as [] and earlier names take precedence
+    default_values = {
+        'strDict': '{}', 'intDict': '{}',
+        'intMatrix': '[]', 'floatMatrix': '[]', 'vspID': '[]',
+        'true': 'True', 'false': 'False', 'NULL': 'None',
+        'uintListFunc': '[]', 'uintList': 'ALL_AVAIL', 'lociList': 'ALL_AVAIL',
+        'intList': 'ALL_AVAIL', 'floatListFunc': '[]', 'floatList': '[]',
+        'stringList': 'ALL_AVAIL', 'stringMatrix': '[]',
+        'subPopList': 'ALL_AVAIL', 'opList': '[]', 'string': '""',
+        'UnnamedSubPop': '""',
+    }
+    default_value_re = re.compile('vector(?:info|u|i|f|a|op|splitter|str|vsp)|' +
+        '|'.join(default_values))
+    # rewrites of C++ argument lists, applied in order by do_argsstring
+    argsstring_subs = [(re.compile(x), y) for x, y in [
+        (r'uintList\(NULL\)', r'UNSPECIFIED'),
+        (r'lociList\(NULL\)', r'UNSPECIFIED'),
+        (r'stringList\((["\w]+),\s*(["\w]+)\)', r'[\1@ \2]'),
+        (r'vectorstr\(1, ([^)]+)\)', r'[\1]'),
+        (r'(.*)vector(str|u|i)\(1,\s*([\w"\d]+)\)(.*)', r'\1\3\4'),
+        (r'\)\s*const\s*$', ')')]]
+    # suffixes of overloaded names and characters latex can not take in
+    # command names, see latexName
+    latex_name_suffixes = [''] + [chr(x) for x in range(ord('a'), ord('z'))]
+    latex_name_table = str.maketrans({':': '', '~': 'tld', '_': 'us',
+        '0': 'o', '1': 'l', '2': 'z'})
 
     def __init__(self, src):
         """Initialize the instance given a source filename
         """
-        f = open(src)
         self.my_dir = os.path.dirname(src)
         # get everything into this XMLDOC
-        self.xmldoc = minidom.parse(f).documentElement
-        f.close()
+        self.xmldoc = etree.parse(src).getroot()
 
         # all the information will be in content,
         # interface and tex files will be generated from content
         self.content = []
 
         # ignore these tags
-        self.ignores = ('inheritancegraph', 'param', 'listofallmembers',
-                        'innerclass', 'name', 'declname', 'incdepgraph',
-                        'invincdepgraph', 'programlisting', 'type',
-                        'references', 'referencedby', 'location',
-                        'collaborationgraph', 'reimplements',
-                        'reimplementedby', 'derivedcompoundref',
-                        'basecompoundref', 'header', 'includes')
-
-        # match one or more space/tab etc
-        self.space_re = re.compile(r'\s+')
-
-        self.lead_spc = re.compile(r'^(%feature\S+\s+\S+\s*?)"\s+(\S)')
+        self.ignores = frozenset(['inheritancegraph', 'param', 'listofallmembers',
+                          'innerclass', 'name', 'declname', 'incdepgraph',
+                          'invincdepgraph', 'programlisting', 'type',
+                          'references', 'referencedby', 'location',
+                          'collaborationgraph', 'reimplements',
+                          'reimplementedby', 'derivedcompoundref',
+                          'basecompoundref', 'header', 'includes'])
+        # a bunch of tags will be handled by do_XXX functions
+        # We defined do_ref, do_emphasis, do_bold, do_computeroutput
+        # do_formula (all using space_parse), do_compindname, do_compounddef
+        # do_parameterlist, do_para, do_parametername, do_parameterdescription
+        # etc..... They are looked up once, here, instead of for each element.
+        self.handlers = dict([(x[3:], getattr(self, x)) for x in dir(self) if x.startswith('do_')])
         self.maxChar = 70
+        # text wrappers used by swig_text, keyed by (start_pos, indent)
+        self.wrappers = {}
         # current field in self.content
         self.curField = ''
-        self.uniqueName = []
+        # compounddef that is being parsed
+        self.compounddef = None
+        # elements in self.compounddef, see compound_nodes
+        self.compound_nodes_cache = {}
+        self.uniqueName = set()
+        self.nameCount = {}
 
 
     def generate(self):
@@ -152,86 +204,68 @@ class Doxy2SWIG:
         data is stored in `self.content`.
         """
         self.parse(self.xmldoc)
+        self.join_text()
 
 
     def parse(self, node):
-        """Parse a given node. This function in turn calls the
-        `parse_<nodeType>` functions which handle the respective
-        nodes.
+        """Parse a given element. This calls specific `do_<tag>` handers
+        for different elements. If no handler is available the
+        `parse_childnodes` method is called. All tags specified in
+        `self.ignores` are simply ignored. Text in and after elements
+        are parsed by `parse_childnodes` of their parents.
         """
-        # every node in a XML tree has __class__.__name__ e.g. Text, Document, etc.
-        # This function get this information and call the relevant function to parse this node.
-        # This is a dispatch function that is by nature recursive.
-        #
-        # in fact, we will only see Element and Text classes.
-        handlerMethod = getattr(self, "parse_%s" % node.__class__.__name__)
-        handlerMethod(node)
-
-
-    def parse_Element(self, node):
-        """Parse an `ELEMENT_NODE`. This calls specific
-        `do_<tagName>` handers for different elements. If no handler
-        is available the `parse_childnodes` method is called. All
-        tagNames specified in `self.ignores` are simply ignored.
-        """
-        name = node.tagName
-        if name in self.ignores:
+        name = node.tag
+        # comments and processing instructions (lxml) have no str tag
+        if not isinstance(name, str) or name in self.ignores:
             return
-        # a bunch of 'tagName's will be handled by do_XXX functions
-        # We defined do_ref, do_emphasis, do_bold, do_computeroutput
-        # do_formula (all using space_parse), do_compindname, do_compounddef
-        # do_parameterlist, do_para, do_parametername, do_parameterdescription
-        # etc.....
-        #
-        attr = "do_%s" % name
-        if hasattr(self, attr):
-            handlerMethod = getattr(self, attr)
-            handlerMethod(node)
-        else:
-            self.parse_childnodes(node)
+        self.handlers.get(name, self.parse_childnodes)(node)
 
-    def parse_Text(self, node):
-        txt = node.data
+    def parse_Text(self, txt):
         # ignore pure whitespace
-        m = self.space_re.match(txt)
-        # for example '     ' yields 5 blank matches
-        if m is not None and len(m.group()) == len(txt):
-            pass
-        else:
+        if not txt.isspace():
             self.add_text(txt)
 
     def add_text(self, value):
-        """Adds text corresponding to `value` into `self.content`."""
+        """Adds text corresponding to `value` into `self.content`.
+        Text fields are lists of pieces until `join_text` is called, an
+        empty field has no pieces."""
+        if not value:
+            return
         # each argument is a list
         if self.curField == 'Arguments':
-            if type(value) in (list, tuple):
-                self.content[-1][self.curField][-1]['Description'] += ' '.join(value)
-            else:
-                self.content[-1][self.curField][-1]['Description'] += value
+            self.content[-1][self.curField][-1]['Description'].append(value)
         else:
-            if type(value) in (list, tuple):
-                self.content[-1][self.curField] += ' '.join(value)
-            else:
-                self.content[-1][self.curField] += value
+            self.content[-1][self.curField].append(value)
+
+    def join_text(self):
+        """Join the pieces of text fields collected by `add_text`."""
+        for entry in self.content:
+            for key, value in entry.items():
+                if key == 'Arguments':
+                    for arg in value:
+                        arg['Description'] = ''.join(arg['Description'])
+                elif type(value) == list:
+                    entry[key] = ''.join(value)
 
     def get_specific_nodes(self, node, names):
         """Given a node and a sequence of strings in `names`, return a
-        dictionary containing the names as keys and child
-        `ELEMENT_NODEs`, that have a `tagName` equal to the name.
+        dictionary containing the names as keys and child elements
+        that have a tag equal to the name.
 
         """
-        nodes = [(x.tagName, x) for x in node.childNodes \
-                         if x.nodeType == x.ELEMENT_NODE and \
-                         x.tagName in names]
+        nodes = [(x.tag, x) for x in node if x.tag in names]
         return dict(nodes)
 
 
     def parse_childnodes(self, node):
-        """parse all child nodes.
+        """parse the text and all child elements of node.
         """
-        #self.parse(node)
-        for n in node.childNodes:
+        if node.text:
+            self.parse_Text(node.text)
+        for n in node:
             self.parse(n)
+            if n.tail:
+                self.parse_Text(n.tail)
 
 
     def space_parse(self, node):
@@ -246,7 +280,7 @@ class Doxy2SWIG:
 
 
     def do_compoundname(self, node):
-        data = node.firstChild.data
+        data = node.text
         self.content.append({'Name': data, 'type': 'class'})
 
 
@@ -275,10 +309,9 @@ class Doxy2SWIG:
 
 
     def do_itemizedlist(self, node):
-        if( node.hasChildNodes ):
-            self.add_text(r'<itemize>')
-            self.parse_childnodes(node)
-            self.add_text(r'</itemize>')
+        self.add_text(r'<itemize>')
+        self.parse_childnodes(node)
+        self.add_text(r'</itemize>')
 
 
     def do_listitem(self, node):
@@ -287,10 +320,20 @@ class Doxy2SWIG:
         self.add_text('</item>')
 
 
+    def compound_nodes(self, tag):
+        '''Return child elements with tag of the compounddef being parsed.
+        They are looked for once because all its memberdefs need them.'''
+        if tag not in self.compound_nodes_cache:
+            self.compound_nodes_cache[tag] = self.compounddef.findall(tag)
+        return self.compound_nodes_cache[tag]
+
+
     def do_compounddef(self, node):
-        kind = node.attributes['kind'].value
+        self.compounddef = node
+        self.compound_nodes_cache = {}
+        kind = node.get('kind')
         if kind in ('class', 'struct'):
-            prot = node.attributes['prot'].value
+            prot = node.get('prot')
             if prot != 'public':
                 return
             names = ('compoundname', 'briefdescription',
@@ -299,12 +342,12 @@ class Doxy2SWIG:
             for n in names:
                 if n in first:
                     self.parse(first[n])
-            for n in node.childNodes:
-                if n not in list(first.values()):
+            skip = set(first.values())
+            for n in node:
+                if n not in skip:
                     self.parse(n)
         elif kind in ('file', 'namespace'):
-            nodes = node.getElementsByTagName('sectiondef')
-            for n in nodes:
+            for n in node.findall('sectiondef'):
                 self.parse(n)
 
     # def do_includes(self, node):
@@ -312,69 +355,63 @@ class Doxy2SWIG:
     #         self.parse_childnodes(node, pad=1)
 
     def do_parameterlist(self, node):
-        if( node.hasChildNodes):
-             self.curField = 'Arguments'
-             if 'Arguments' not in self.content[-1]:
-                 self.content[-1]['Arguments'] = []
-             self.parse_childnodes(node)
+        self.curField = 'Arguments'
+        if 'Arguments' not in self.content[-1]:
+            self.content[-1]['Arguments'] = []
+        self.parse_childnodes(node)
         self.curField = 'Details'
 
 
     def do_para(self, node):
-        if self.curField == 'Details' and self.content[-1]['Details'] != '':
-            self.content[-1]['Details'] += '\n\n'
+        if self.curField == 'Details' and self.content[-1]['Details']:
+            self.content[-1]['Details'].append('\n\n')
         self.parse_childnodes(node)
 
 
     def do_parametername(self, node):
-        if node.firstChild.nodeName == 'ref':
-            parameter_name = node.firstChild.firstChild.data.strip()
+        if not node.text and len(node) > 0 and node[0].tag == 'ref':
+            parameter_name = node[0].text.strip()
         else:
-            parameter_name = node.firstChild.data.strip()
+            parameter_name = node.text.strip()
         assert self.curField == 'Arguments'
-        self.content[-1][self.curField].append({'Name': parameter_name, 'Description': ''})
+        self.content[-1][self.curField].append({'Name': parameter_name, 'Description': []})
 
 
     def do_detaileddescription(self, node):
         self.curField = 'Details'
         if 'Details' not in self.content[-1]:
-            self.content[-1]['Details'] = ''
+            self.content[-1]['Details'] = []
         self.parse_childnodes(node)
 
 
     def do_briefdescription(self, node):
         self.curField = 'Description'
-        self.content[-1]['Description'] = ''
+        self.content[-1]['Description'] = []
         self.parse_childnodes(node)
 
 
     def do_memberdef(self, node):
-        prot = node.attributes['prot'].value
-        id = node.attributes['id'].value
-        kind = node.attributes['kind'].value
-        tmp = node.parentNode.parentNode.parentNode
-        compdef = tmp.getElementsByTagName('compounddef')[0]
-        cdef_kind = compdef.attributes['kind'].value
+        prot = node.get('prot')
+        id = node.get('id')
+        kind = node.get('kind')
+        # memberdef is always in a sectiondef of a compounddef
+        cdef_kind = self.compounddef.get('kind')
 
         if prot == 'public':
             first = self.get_specific_nodes(node, ('definition', 'name'))
-            name = first['name'].firstChild.data
+            name = first['name'].text
             if name[:8] == 'operator': # Don't handle operators yet.
                 return            
-            # defn = first['definition'].firstChild.data
-            defn = ''
-            for n in first['definition'].childNodes:
-                defn = defn + n.data
+            defn = ''.join(first['definition'].itertext())
 
             # its type determined by parents
-            anc = node.parentNode.parentNode
             if cdef_kind in ('file', 'namespace'):
-                ns_node = anc.getElementsByTagName('innernamespace')
+                ns_node = self.compound_nodes('innernamespace')
 
                 if not ns_node and cdef_kind == 'namespace':
-                    ns_node = anc.getElementsByTagName('compoundname')
+                    ns_node = self.compound_nodes('compoundname')
                 if ns_node:
-                    ns = ns_node[0].firstChild.data
+                    ns = ns_node[0].text
                     #
                     # FIXME: when the sandbox namespace is introduced to sandbox.h/cpp, it somehow
                     # manifests itself to all namespaces in this script (doxygen output is correct).
@@ -385,18 +422,18 @@ class Doxy2SWIG:
                         ns = ns.split(':')[0]
                     func_name = '%s::%s' %(ns, name)
                     self.content.append({'Name': func_name, 'type': 'global_function'})
-                    self.content[-1]['Usage'] = func_name.split(':')[-1]
+                    self.content[-1]['Usage'] = [func_name.split(':')[-1]]
                     self.curField = 'Usage'
                 else:
                     self.content.append({'Name': name})
                     print("Content type unknown??? ", name)
-                    self.content[-1]['Usage'] = ''
+                    self.content[-1]['Usage'] = []
                     self.curField = 'Usage'
                     self.add_text( defn.split(' ')[-1] )
             elif cdef_kind in ('class', 'struct'):
                 # Get the full function name.
-                anc_node = anc.getElementsByTagName('compoundname')
-                cname = anc_node[0].firstChild.data
+                anc_node = self.compound_nodes('compoundname')
+                cname = anc_node[0].text
                 classname = cname.split('::')[-1]
                 if classname == name:
                     self.content.append({'Name': '%s::%s' %(cname, name),
@@ -404,7 +441,7 @@ class Doxy2SWIG:
                 else:
                     self.content.append({'Name': '%s::%s' %(cname, name),
                                          'type': 'memberofclass_%s' % cname})
-                self.content[-1]['Usage'] = ''
+                self.content[-1]['Usage'] = []
                 self.curField = 'Usage'
                 defName = defn.split(' ')[-1]
                 if( defName == cname.split(':')[-1] ): # constructor
@@ -413,33 +450,33 @@ class Doxy2SWIG:
                     self.add_text( 'x.' )
                     self.add_text( self.swig_text( defName, 0, 0 ) )
 
-            for n in node.childNodes:
-                if n not in list(first.values()):
+            skip = set(first.values())
+            for n in node:
+                if n not in skip:
                     self.parse(n)
 
 
     def do_sectiondef(self, node):
-        kind = node.attributes['kind'].value
+        kind = node.get('kind')
         if kind in ('public-func', 'func', 'user-defined'):
                 self.parse_childnodes(node)
 
 
     def do_xrefsect(self, node):
-        # first child
-        # print node.firstChild.tagName
-        if(node.firstChild.firstChild.data == 'Test'):
+        # first child is xreftitle
+        if node[0].text == 'Test':
             self.curField = 'Examples'
-            self.content[-1]['Examples'] = ''
+            self.content[-1]['Examples'] = []
             self.parse_childnodes(node)
 
 
     def do_simplesect(self, node):
-        kind = node.attributes['kind'].value
+        kind = node.get('kind')
         if kind in ('date', 'rcs', 'version'):
             pass
         if kind in ('warning', 'see', 'note', 'return'):
             self.curField = kind
-            self.content[-1][kind] = ''
+            self.content[-1][kind] = []
             self.parse_childnodes(node)
         else:
             self.parse_childnodes(node)
@@ -447,21 +484,14 @@ class Doxy2SWIG:
 
 
     def do_argsstring(self, node):
-        txt = ''
-        for n in node.childNodes:
-            txt = txt + n.data
+        txt = ''.join(node.itertext())
         if txt.split('=')[-1].strip() == '0':
              # remove =0 from function definition (WHY?)
              txt = '='.join(txt.split('=')[:-1])
         self.content[-1]['cppArgs'] = txt
         # @ is used instead of , to avoid separation of replaced text, it will be replaced back to ,
-        txt = re.sub(r'uintList\(NULL\)', r'UNSPECIFIED', txt)
-        txt = re.sub(r'lociList\(NULL\)', r'UNSPECIFIED', txt)
-        txt = re.sub(r'stringList\((["\w]+),\s*(["\w]+)\)', r'[\1@ \2]', txt)
-        txt = re.sub(r'vectorstr\(1, ([^)]+)\)', r'[\1]', txt)
-        txt = re.sub(r'(.*)vector(str|u|i)\(1,\s*([\w"\d]+)\)(.*)', r'\1\3\4', txt)
-        txt = re.sub(r'\)\s*const\s*$', ')', txt)
-        #txt = txt.replace(')    const',')')
+        for pattern, repl in self.argsstring_subs:
+            txt = pattern.sub(repl, txt)
         args = txt.split(',')
         out=[]
         for s in args:
@@ -474,30 +504,9 @@ class Doxy2SWIG:
             var = var.replace('*', '')
             if( len( piece ) == 2 ):
                 defVal = piece[1].split('(')[0].split(')')[0].split(')')[0]
-                # re function used to repalce the following sentances
-                vect = re.compile('vector(info|u|i|f|a|op|splitter|str|vsp)')
-                defVal = vect.sub('[]', defVal)
-                defVal = defVal.replace('strDict','{}')
-                defVal = defVal.replace('intDict','{}')
-                defVal = defVal.replace('intMatrix','[]')
-                defVal = defVal.replace('floatMatrix','[]')
-                defVal = defVal.replace('vspID','[]')
-                defVal = defVal.replace('true','True')
-                defVal = defVal.replace('false','False')
-                defVal = defVal.replace('NULL','None')
-                defVal = defVal.replace('uintListFunc','[]')
-                defVal = defVal.replace('uintList','ALL_AVAIL')
-                defVal = defVal.replace('lociList','ALL_AVAIL')
-                defVal = defVal.replace('intList','ALL_AVAIL')
-                defVal = defVal.replace('floatListFunc','[]')
-                defVal = defVal.replace('floatList','[]')
-                defVal = defVal.replace('stringList','ALL_AVAIL')
-                defVal = defVal.replace('stringMatrix','[]')
-                defVal = defVal.replace('subPopList', 'ALL_AVAIL')
-                defVal = defVal.replace('opList','[]')
-                defVal = defVal.replace('string','""')
-                defVal = defVal.replace('UnnamedSubPop','""')
-                #defVal = defVal.replace('""', "''")
+                # replace C++ default values in one pass
+                defVal = self.default_value_re.sub(
+                    lambda m: self.default_values.get(m.group(), '[]'), defVal)
                 out.append(var + '=' + defVal)
             else:
                 out.append(var)
@@ -505,8 +514,8 @@ class Doxy2SWIG:
 
 
     def do_member(self, node):
-        kind = node.attributes['kind'].value
-        refid = node.attributes['refid'].value
+        kind = node.get('kind')
+        refid = node.get('refid')
         if kind == 'function' and refid[:9] == 'namespace':
             self.parse_childnodes(node)
 
@@ -520,24 +529,27 @@ class Doxy2SWIG:
               </compound>
             </doxygenindex>
 
-            In this case, we process each compound using a Doxy2SWIG class and
-            obtain its results.
+            In this case, we parse the file of each compound and add its
+            results to self.content.
         '''
-        comps = node.getElementsByTagName('compound')
+        comps = node.iter('compound')
         for c in comps:
-            refid = c.attributes['refid'].value
+            refid = c.get('refid')
             fname = refid + '.xml'
             if not os.path.exists(fname):
                 fname = os.path.join(self.my_dir, fname)
             print("parsing file: %s" % fname)
-            #try:
-            p = Doxy2SWIG(fname)
-            p.generate()
-            self.content.extend(p.content)
-            #except Exception, e:
-            #    print "This file can not be parsed, something wrong with file format"
-            #    print e
-            #    pass
+            self.parse_compound_file(fname)
+
+    def parse_compound_file(self, fname):
+        '''Parse the compounddefs in a Doxygen XML file. Each compounddef
+        is parsed as soon as it is read and released afterwards, so that
+        the whole document is never kept in memory.'''
+        for event, elem in etree.iterparse(fname):
+            if elem.tag == 'compounddef':
+                self.curField = ''
+                self.parse(elem)
+                elem.clear()
 
     def fix_entries(self):
         def myhash(entry):
@@ -548,8 +560,14 @@ class Doxy2SWIG:
             if 'Details' in entry:
                 ret += entry['Details']
             return ret
-        seen = []
-        self.content = [x for x in self.content if not (myhash(x) in seen or seen.append(myhash(x)))]
+        seen = set()
+        content = []
+        for entry in self.content:
+            key = myhash(entry)
+            if key not in seen:
+                seen.add(key)
+                content.append(entry)
+        self.content = content
         print("Unique entries: ", len(self.content))
         #
         for entry in self.content:
@@ -579,7 +597,7 @@ class Doxy2SWIG:
                     entry['Doc'] += entry['Details']
             #
             if entry['Doc'] == '':
-                print(('Warning: No documentation for ', entry['Name']))
+                print('Warning: No documentation for ', entry['Name'])
                 entry['Doc'] = 'FIXME: No document'
             #
             entry['ignore'] = 'CPPONLY' in entry['Doc']
@@ -588,7 +606,9 @@ class Doxy2SWIG:
             if entry['ignore'] and '~' in entry['Name']:
                 print("Desctructor of %s has CPPONLY. Please correct it." % entry['Name'])
                 sys.exit(1)
-        # handle Examples
+        # handle Examples, an example file can be referred to by several
+        # entries so its path and content are read only once
+        examples = {}
         for entry in self.content:
             if 'Examples' in entry and entry['Examples'].strip() != '':
                 # get file name
@@ -600,24 +620,27 @@ class Doxy2SWIG:
                     filename = pieces[0]
                     title = ' '.join(pieces[1:])
                 # get content as string
-                try:
+                if filename not in examples:
                     try:
-                        # usual ../doc/log directory
-                        file = open(os.path.join('..', 'doc', 'log', filename))
-                        entry['ExampleFile'] = os.path.join('..', 'doc', 'log', filename)
+                        try:
+                            # usual ../doc/log directory
+                            file = open(os.path.join('..', 'doc', 'log', filename))
+                            path = os.path.join('..', 'doc', 'log', filename)
+                        except:
+                            # local file
+                            file = open(filename)
+                            path = filename
+                        examples[filename] = (path, file.read())
+                        file.close()
                     except:
-                        # local file
-                        file = open(filename)
-                        entry['ExampleFile'] = filename
-                    cont = file.read()
-                    file.close()
-                    # add file content to 'Examples'
-                    entry['Examples'] = cont
-                    entry['ExampleTitle'] = title
-                except:
+                        examples[filename] = None
+                entry['ExampleTitle'] = title
+                if examples[filename] is None:
                     entry['ExampleFile'] = None
-                    entry['ExampleTitle'] = title
                     print("File " + filename + " does not exist\n")
+                else:
+                    # add file content to 'Examples'
+                    entry['ExampleFile'], entry['Examples'] = examples[filename]
 
     def post_process(self):
         # remove duplicate entry
@@ -646,44 +669,42 @@ class Doxy2SWIG:
         print("Number of entries: ", len(self.content))
         self.fix_entries()
         #
-        self.content.sort(key=lambda x: x['Name'])
+        self.content.sort(key=itemgetter('Name'))
 
     def write_swig(self, out):
+        parts = []
+        emit = parts.append
         for entry in self.content:
             if entry['ignore']:
                 if 'cppArgs' in entry:
-                    print('%%ignore %s%s;\n' % (entry['Name'], entry['cppArgs'].strip()), file=out)
+                    emit('%%ignore %s%s;\n\n' % (entry['Name'], entry['cppArgs'].strip()))
                 else:
-                    print('%%ignore %s;\n' % entry['Name'].strip(), file=out)
+                    emit('%%ignore %s;\n\n' % entry['Name'].strip())
                 continue
             if entry['hidden']:
-                print('%%feature("docstring") %s "Obsolete or undocumented function."\n' % entry['Name'], file=out)
+                emit('%%feature("docstring") %s "Obsolete or undocumented function."\n\n' % entry['Name'])
                 continue
-            print('%%feature("docstring") %s "\n' % entry['Name'], file=out)
-            if 'Description' in entry and entry['Description'] != '':
-                print('Description:', file=out)
-                print('\n    %s\n' % self.swig_text(entry['Description'], 0, 4), file=out)
-            if 'Usage' in entry and entry['Usage'] != '':
-                print('Usage:', file=out)
-                print('\n    %s\n' % self.swig_text(entry['Usage'], 0, 6), file=out)
-            if 'Details' in entry and entry['Details'] != '':
-                print('Details:', file=out)
-                print('\n    %s\n' % self.swig_text(entry['Details'], 0, 4), file=out)
-            if 'Arguments' in entry and entry['Arguments'] != '':
-                print('Arguments:\n', file=out)
+            emit('%%feature("docstring") %s "\n\n' % entry['Name'])
+            if entry.get('Description', '') != '':
+                emit('Description:\n\n    %s\n\n' % self.swig_text(entry['Description'], 0, 4))
+            if entry.get('Usage', '') != '':
+                emit('Usage:\n\n    %s\n\n' % self.swig_text(entry['Usage'], 0, 6))
+            if entry.get('Details', '') != '':
+                emit('Details:\n\n    %s\n\n' % self.swig_text(entry['Details'], 0, 4))
+            if entry.get('Arguments', '') != '':
+                emit('Arguments:\n\n')
                 for arg in entry['Arguments']:
-                    print('    %-16s%s' % (arg['Name']+':', self.swig_text(arg['Description'], 0, 20)), file=out)
-                print(file=out)
-            if 'note' in entry and entry['note'] != '':
-                print('Note:', file=out)
-                print('\n    %s\n' % self.swig_text(entry['note'], 0, 4), file=out)
-            if 'Examples' in entry and entry['Examples'] != '':
-                print('Example:', file=out)
-                print('\n%s\n' % entry['Examples'].replace('\\', r'\\\\').replace('"', r'\"'), file=out)
+                    emit('    %-16s%s\n' % (arg['Name']+':', self.swig_text(arg['Description'], 0, 20)))
+                emit('\n')
+            if entry.get('note', '') != '':
+                emit('Note:\n\n    %s\n\n' % self.swig_text(entry['note'], 0, 4))
+            if entry.get('Examples', '') != '':
+                emit('Example:\n\n%s\n\n' % entry['Examples'].replace('\\', r'\\\\').replace('"', r'\"'))
             #if len(str) > 2048:
             #    #print 'Entry %s is too long (%d)' % (entry['Name'], len(str))
             #    str = str[0:1970] + '...' + '\n\nPlease refer to the reference manual for more details.\n\n'
-            print('\"; \n', file=out)
+            emit('\"; \n\n')
+        out.write(''.join(parts))
 
 
     def replacePythonConstants(self, text):
@@ -706,6 +727,13 @@ class Doxy2SWIG:
             pass
         return text
 
+    def formatargs(self, func):
+        '''Return the argument list of a Python function such as
+        (a, b=1, *args), raise TypeError for built-in callables.'''
+        if not inspect.isfunction(func) and not inspect.ismethod(func):
+            raise TypeError('%s is not a Python function' % func)
+        return str(inspect.signature(func))
+
     def scan_module(self, module):
         ''' scan python module file and retrieve function definitions '''
         # add module entry
@@ -741,13 +769,11 @@ class Doxy2SWIG:
                 self.content[-1]['hidden'] = 'HIDDEN' in self.content[-1]['Doc']
                 # these is no details...
                 try:
-                    args, varargs, varkw, defaults = inspect.getargspec(value.__init__)
+                    self.content[-1]['Usage'] = key + self.formatargs(value.__init__)
                 except:
-                    print(('Failed to get args for {}'.format(value.__init__)))
+                    print('Failed to get args for {}'.format(value.__init__))
                     self.content.pop()
                     continue
-                self.content[-1]['Usage'] = key + inspect.formatargspec(
-                    args, varargs, varkw, defaults)
                 self.content[-1]['Usage'] = self.content[-1]['Usage'].replace('self, ', '').replace('self)', ')')
                 self.content[-1]['Usage'] = self.replacePythonConstants(self.content[-1]['Usage'])
                 members = []
@@ -755,12 +781,11 @@ class Doxy2SWIG:
                     if not visiblename(key1) or key1.startswith('_'):
                         continue
                     try:
-                        args, varargs, varkw, defaults = inspect.getargspec(value1)
+                        usage = key1 + self.formatargs(value1)
                     except:
                         continue
                     member = {'Name': key1}
-                    member['Usage'] = key1 + inspect.formatargspec(
-                        args, varargs, varkw, defaults)
+                    member['Usage'] = usage
                     member['Usage'] = member['Usage'].replace('self, ', '').replace('self)', ')')
                     member['Usage'] = re.sub(r'(<simuPOP.(\w+)>)', r'\2()', member['Usage'])
                     member['Doc'] = getdoc(value1)
@@ -772,9 +797,7 @@ class Doxy2SWIG:
                     continue
                 self.content.append({'type': 'module_func', 'module': module})
                 self.content[-1]['Name'] = key
-                args, varargs, varkw, defaults = inspect.getargspec(value)
-                self.content[-1]['Usage'] = key + inspect.formatargspec(
-                    args, varargs, varkw, defaults)
+                self.content[-1]['Usage'] = key + self.formatargs(value)
                 self.content[-1]['Usage'] = self.replacePythonConstants(self.content[-1]['Usage'])
                 self.content[-1]['Description'] = getdoc(value)
                 # latex can not yet handle numbers in function name
@@ -787,65 +810,48 @@ class Doxy2SWIG:
 
 
     def latexName(self, name):
-        # function name can overload
-        uname = None
-        for suffix in [''] + [chr(x) for x in range(ord('a'), ord('z'))]:
-            if name + suffix not in self.uniqueName:
-                uname = name + suffix
-                self.uniqueName.append(uname)
-                break
-        if uname is None:
+        # function name can overload, nameCount counts the uses of each name
+        # and uniqueName holds the names that have been handed out
+        count = self.nameCount.get(name, 0)
+        while count < len(self.latex_name_suffixes) and \
+                name + self.latex_name_suffixes[count] in self.uniqueName:
+            count += 1
+        if count >= len(self.latex_name_suffixes):
             print(name, ' has too many overload names!')
             print(self.uniqueName)
             sys.exit(0)
-        return uname.replace(':', '').replace('~', 'tld').replace('_', 'us').replace('0', 'o').replace('1', 'l').replace('2', 'z')
+        self.nameCount[name] = count + 1
+        uname = name + self.latex_name_suffixes[count]
+        self.uniqueName.add(uname)
+        return uname.translate(self.latex_name_table)
 
 
     def latex_text(self, text):
         """ wrap text given current indent """
-        # handle the in-text and displayed math formulas
-        newtext = ''
+        # handle the in-text and displayed math formulas, special
+        # characters are only escaped outside of them
+        pieces = []
         inmath = False
         indispmath = False
-        dispstart = False
-        for i in range(len(text)):
-            if dispstart:
-                # skip [ or ] after \[, \] for display math mode
-                dispstart = False
-                continue
-            if text[i] == '$':
+        start = 0
+        for m in self.latex_math_re.finditer(text):
+            if inmath or indispmath:
+                pieces.append(text[start:m.start()])
+            else:
+                pieces.append(text[start:m.start()].translate(self.latex_escapes))
+            if m.group() == '$':
                 inmath = not inmath
-                newtext += '$'
-            elif i+1 < len(text) and text[i:i+2] == r'\[':
-                indispmath = True
-                newtext += '$$'
-                dispstart = True
-            elif i+1 < len(text) and text[i:i+2] == r'\]':
-                indispmath = False
-                newtext += '$$'
-                dispstart = True
+                pieces.append('$')
             else:
-                if not inmath and not indispmath and text[i] in ['\\', '&', '$', '~', '%', '#', '_', '{', '}', '^']:
-                    newtext += '\\' + text[i]
-                else:
-                    newtext += text[i]
-        text = newtext
-        #text = re.compile(r'%s' % text)
-        text = text.replace('<em>', r'{\em ')
-        text = text.replace('</em>', '}')
-        text = text.replace('<tt>', r'{\tt ')
-        text = text.replace('</tt>', '}')
-        text = text.replace('<bf>', r'{\bf ')
-        text = text.replace('</bf>', '}')
-        text = text.replace('</newline>', '\n\n')
-        text = text.replace('<itemize>', r'\begin{itemize} ')
-        text = text.replace('</itemize>', r'\end{itemize}')
-        text = text.replace('<item>', r'\item ')
-        text = text.replace('</item>', ' ')
-        text = text.replace('>','>{}')
-        #text = text.replace('<par>', r'\par ')
-        #text = text.replace('</par>', ' ')
-        return text
+                indispmath = m.group() == r'\['
+                pieces.append('$$')
+            start = m.end()
+        if inmath or indispmath:
+            pieces.append(text[start:])
+        else:
+            pieces.append(text[start:].translate(self.latex_escapes))
+        text = ''.join(pieces)
+        return self.latex_tags_re.sub(lambda m: self.latex_tags[m.group()], text)
 
 
     def latex_formatted_text(self, text):
@@ -874,27 +880,38 @@ class Doxy2SWIG:
         text = text.replace('<item>', r'</newline> * ')
         text = text.replace('</item>', '')
         #displayed formulas in swig file
-        text = text.replace('\[', r'</newline> $')
-        text = text.replace('\]', '$')
+        text = text.replace(r'\[', r'</newline> $')
+        text = text.replace(r'\]', '$')
         for i in range(10):
             text = text.replace('  ', ' ')
         #used in swig file output
         text = text.split(r'</newline>')
+        if (start_pos, indent) not in self.wrappers:
+            self.wrappers[(start_pos, indent)] = textwrap.TextWrapper(width=self.maxChar,
+                initial_indent=' '*(start_pos+indent),
+                subsequent_indent = ' '*indent)
+        wrapper = self.wrappers[(start_pos, indent)]
         strs = []
         for txt in text:
-            strs.extend(textwrap.wrap(txt.lstrip('\n '), width=self.maxChar,
-                initial_indent=' '*(start_pos+indent),
-                subsequent_indent = ' '*indent))
+            strs.extend(wrapper.wrap(txt.lstrip('\n ')))
         return  ('\n'.join(strs)).lstrip().replace('\\', '\\\\').replace('"', r'\"')
 
 
+    def entries_by_type(self):
+        '''Return entries in self.content grouped by their type'''
+        types = {}
+        for entry in self.content:
+            types.setdefault(entry['type'], []).append(entry)
+        return types
+
     def write_latex(self, out):
+        types = self.entries_by_type()
         # first handle glocal functions
-        for entry in [x for x in self.content if x['type'] == 'global_function' and not x['ignore'] and not x['hidden'] \
+        for entry in [x for x in types.get('global_function', []) if not x['ignore'] and not x['hidden'] \
                 and 'test' not in x['Name']]:
             funcname = self.latexName(entry['Name'].replace('simuPOP::', '', 1))
             print('\\newcommand{\\%sRef}{' % funcname, file=out)
-            print('\n\\subsection{Function \\texttt{%s}\index{%s}}' % (funcname, funcname), file=out)
+            print('\n\\subsection{Function \\texttt{%s}\\index{%s}}' % (funcname, funcname), file=out)
             if 'Usage' in entry and entry['Usage'] != '':
                 func_name = entry['Usage'].split('(')[0]
                 func_body = entry['Usage'][len(func_name):].lstrip('(').rstrip(')')
@@ -903,7 +920,7 @@ class Doxy2SWIG:
             else:
                 print('\\par\n\\begin{funcdesc}{%s}{}\n\\par' % funcname, file=out)
             if entry['Doc'] == '':
-                print(('Warning: no documentation for ', entry['Name']))
+                print('Warning: no documentation for ', entry['Name'])
                 print(r'FIXME: No document.\par', file=out)
             else:
                 print(r'\MakeUppercase %s\par' % self.latex_text(entry['Doc']), file=out)
@@ -929,19 +946,19 @@ class Doxy2SWIG:
             #mod = [x for x in self.content if x['type'] == 'docofmodule_' + module][0]
 
             print('\\newcommand{\\%sRef}{\\index{%s}' % (module.replace('.', ''), module), file=out)
-            doc = [x['Doc'] for x in self.content if x['type'] == 'docofmodule_' + module][0]
+            doc = types['docofmodule_' + module][0]['Doc']
             print(self.latex_formatted_text(doc), file=out)
             print('}\n', file=out)
 
             # module functions
-            funcs = [x for x in self.content if x['type'] == 'module_func' and x['module'] == module and not x['ignore'] and not x['hidden']]
+            funcs = [x for x in types.get('module_func', []) if x['module'] == module and not x['ignore'] and not x['hidden']]
             # sort it
-            funcs.sort(key=lambda x: x['Name'])
+            funcs.sort(key=itemgetter('Name'))
             # print all functions
             #print >> out, '\\begin{description}'
             for mem in funcs:
                 print('\\newcommand{\\%s%sRef}{\\index{%s!%s}' % (module.replace('.',''), mem['Name'], module, mem['Name']), file=out)
-                print('\n\\subsection{Function \\texttt{%s}\index{%s}}' % (mem['Name'], mem['Name']), file=out)
+                print('\n\\subsection{Function \\texttt{%s}\\index{%s}}' % (mem['Name'], mem['Name']), file=out)
                 if 'Usage' in mem and mem['Usage'] != '':
                     func_name = mem['Usage'].split('(')[0]
                     func_body = mem['Usage'][len(func_name):].lstrip('(').rstrip(')')
@@ -954,13 +971,13 @@ class Doxy2SWIG:
                     print('\\par\n\\strong{Note: }%s\\par' % self.latex_text(mem['note']), file=out)
                 print('\\end{funcdesc}\n}\n', file=out)
             # module classes
-            classes = [x for x in self.content if x['type'] == 'module_class' and x['module'] == module and not x['ignore'] and not x['hidden']]
+            classes = [x for x in types.get('module_class', []) if x['module'] == module and not x['ignore'] and not x['hidden']]
             # sort it
-            classes.sort(key=lambda x: x['Name'])
+            classes.sort(key=itemgetter('Name'))
             # print all functions
             for cls in classes:
                 print('\\newcommand{\\%s%sRef}{' % (module.replace('.', ''), cls['Name']), file=out)
-                print('\n\\subsection{Class \\texttt{%s}\index{module!%s}' % (cls['Name'], cls['Name']), file=out)
+                print('\n\\subsection{Class \\texttt{%s}\\index{module!%s}' % (cls['Name'], cls['Name']), file=out)
                 print('}\n', file=out)
                 print(r' %s' % self.latex_formatted_text(cls['Doc']), file=out)
                 if 'Usage' in cls and cls['Usage'] != '':
@@ -990,7 +1007,7 @@ class Doxy2SWIG:
                     print('\\end{methoddesc}\n', file=out)
                 print('\\end{classdesc}\n}\n', file=out)
         # then classes
-        for entry in [x for x in self.content if x['type'] == 'class' and not x['ignore'] and not x['hidden']]:
+        for entry in [x for x in types.get('class', []) if not x['ignore'] and not x['hidden']]:
             print('\\newcommand{\\%sRef}{' % self.latexName(entry['Name'].replace('simuPOP::', '', 1).replace('.', '')), file=out)
             classname = self.latex_text(entry['Name'].replace('simuPOP::', '', 1))
             print('\n\\subsection{Class \\texttt{%s}\\index{class!%s}}\n' % (classname, classname), file=out)
@@ -999,7 +1016,7 @@ class Doxy2SWIG:
                 print('\\par\n\\strong{Note: }\n\\par', file=out)
                 print('%s' % self.latex_text(entry['note']), file=out)
             # only use the first constructor
-            constructor = [x for x in self.content if x['type'] == 'constructorofclass_' + entry['Name'] and not x['ignore'] and not x['hidden']]
+            constructor = [x for x in types.get('constructorofclass_' + entry['Name'], []) if not x['ignore'] and not x['hidden']]
             if len(constructor) == 0:
                 print('}\n', file=out)
                 continue
@@ -1030,19 +1047,9 @@ class Doxy2SWIG:
             if 'note' in cons and cons['note'] != '':
                 print('\\par\n\\strong{Note} ', file=out)
                 print('%s' % self.latex_text(cons['note']), file=out)
-            members = [x for x in self.content if x['type'] == 'memberofclass_' + entry['Name'] and \
+            members = [x for x in types.get('memberofclass_' + entry['Name'], []) if \
                        not x['ignore'] and not x['hidden'] and not '~' in x['Name'] and not '__' in x['Name']]
-            def sort_member(x, y):
-                if 'group' not in x:
-                    print(x)
-                if 'group' not in y:
-                    print(y)
-                res = cmp(x['group'], y['group'])
-                if res == 0:
-                    return cmp(x['Name'], y['Name'])
-                else:
-                    return res
-            members.sort(key=lambda x: x['group']) # cmp_to_key(sort_member))
+            members.sort(key=itemgetter('group'))
             if len(members) == 0:
                 print('\\end{classdesc}\n}\n', file=out)
                 continue
@@ -1082,7 +1089,7 @@ class Doxy2SWIG:
     def wrap_reST(self, input, initial_indent = '   ', subsequent_indent = '   '):
         text = input
         for tag in ['<tt>', '<bf>', '<em>', '<item>']:
-            text = re.sub('%s\s*' % tag, tag, text)
+            text = re.sub(r'%s\s*' % tag, tag, text)
         # highlight stuff
         for keyword in list(self.auto_keywords.keys()):
             for tag in ['tt', 'bf']:
@@ -1126,8 +1133,9 @@ class Doxy2SWIG:
         return '\n'.join([shift + x for x in text.split('\n')])
 
     def write_reST(self, dir):
+        types = self.entries_by_type()
         # first handle glocal functions
-        for entry in [x for x in self.content if x['type'] == 'global_function' and not x['ignore'] and not x['hidden'] \
+        for entry in [x for x in types.get('global_function', []) if not x['ignore'] and not x['hidden'] \
                 and 'test' not in x['Name']]:
             refName = '%sRef.ref' % entry['Name'].replace('simuPOP::', '', 1).replace('.', '')
             print('Writing reference for global function ', refName)
@@ -1164,15 +1172,15 @@ class Doxy2SWIG:
             if module != 'simuPOP':
                 print(file=out)
                 print('.. module:: %s\n' % module, file=out)
-            doc = [x['Doc'] for x in self.content if x['type'] == 'docofmodule_' + module][0]
+            doc = types['docofmodule_' + module][0]['Doc']
             print(doc, file=out)
             out.close()
             #
             # module functions
-            funcs = [x for x in self.content if x['type'] == 'module_func' \
-                and x['module'] == module and not x['ignore'] and not x['hidden']]
+            funcs = [x for x in types.get('module_func', []) \
+                if x['module'] == module and not x['ignore'] and not x['hidden']]
             # sort it
-            funcs.sort(key=lambda x: x['Name'])
+            funcs.sort(key=itemgetter('Name'))
             # print all functions
             #print >> out, '\\begin{description}'
             for mem in funcs:
@@ -1195,9 +1203,9 @@ class Doxy2SWIG:
                     print(self.shiftText(mem['note']), file=out)
                 out.close()
             # module classes
-            classes = [x for x in self.content if x['type'] == 'module_class' and x['module'] == module and not x['ignore'] and not x['hidden']]
+            classes = [x for x in types.get('module_class', []) if x['module'] == module and not x['ignore'] and not x['hidden']]
             # sort it
-            classes.sort(key=lambda x: x['Name'])
+            classes.sort(key=itemgetter('Name'))
             # print all functions
             for cls in classes:
                 refName = '%s%sRef.ref' % (module.replace('.', ''), cls['Name'])
@@ -1230,7 +1238,7 @@ class Doxy2SWIG:
                     print(file=out)
                 out.close()
         # then classes
-        for entry in [x for x in self.content if x['type'] == 'class' and not x['ignore'] and not x['hidden']]:
+        for entry in [x for x in types.get('class', []) if not x['ignore'] and not x['hidden']]:
             refName = '%sRef.ref' % entry['Name'].replace('simuPOP::', '', 1).replace('.', '')
             print('Writing reference for class ', refName)
             out = open(os.path.join(dir, refName), 'w')
@@ -1246,7 +1254,7 @@ class Doxy2SWIG:
                 print('%s' % self.wrap_reST(entry['note'].strip(), ' '*6, ' '*6), file=out)
             print(file=out)
             # only use the first constructor
-            constructor = [x for x in self.content if x['type'] == 'constructorofclass_' + entry['Name'] and not x['ignore'] and not x['hidden']]
+            constructor = [x for x in types.get('constructorofclass_' + entry['Name'], []) if not x['ignore'] and not x['hidden']]
             if len(constructor) == 0:
                 continue
             elif len(constructor) > 1:
@@ -1270,19 +1278,9 @@ class Doxy2SWIG:
                 print('      .. note::\n', file=out)
                 print('%s' % self.wrap_reST(cons['note'], ' '*9, ' '*9), file=out)
             #
-            members = [x for x in self.content if x['type'] == 'memberofclass_' + entry['Name'] and \
+            members = [x for x in types.get('memberofclass_' + entry['Name'], []) if \
                        not x['ignore'] and not x['hidden'] and not '~' in x['Name'] and not '__' in x['Name']]
-            def sort_member(x, y):
-                if 'group' not in x:
-                    print(x)
-                if 'group' not in y:
-                    print(y)
-                res = cmp(x['group'], y['group'])
-                if res == 0:
-                    return cmp(x['Name'], y['Name'])
-                else:
-                    return res
-            members.sort(key=lambda x: x['group']) # sort_member)
+            members.sort(key=itemgetter('group'))
             if len(members) == 0:
                 continue
             group = ''
@@ -1297,6 +1295,7 @@ class Doxy2SWIG:
             out.close()
 
     def write_latex_testfile(self, out, ref_file):
+        types = self.entries_by_type()
         print(r'''\documentclass[oneside,english]{manual}
 \usepackage[T1]{fontenc}
 \usepackage[latin9]{inputenc}
@@ -1332,9 +1331,9 @@ xleftmargin=15pt}
 
 \lstlistoflistings
 \include{%s}''' % os.path.basename(os.path.splitext(ref_file)[0]), file=out)
-        global_funcs = [x for x in self.content if x['type'] == 'global_function' and not x['ignore'] and not x['hidden'] \
+        global_funcs = [x for x in types.get('global_function', []) if not x['ignore'] and not x['hidden'] \
                 and 'test' not in x['Name']]
-        global_funcs.sort(key=lambda x: x['Name'])
+        global_funcs.sort(key=itemgetter('Name'))
         for entry in global_funcs:
              print(r'\%sRef' % self.latexName(entry['Name'].replace('simuPOP::', '', 1)), file=out)
              print(r'\vspace{.5in}\par\rule[.5ex]{\linewidth}{1pt}\par\vspace{0.3in}', file=out)
@@ -1342,19 +1341,19 @@ xleftmargin=15pt}
         modules = set(
             [x['module'] for x in self.content if x['type'].startswith('module') and not x['ignore'] and not x['hidden']])
         for module in modules:
-            funcs = [x for x in self.content if x['type'] == 'module_func' and x['module'] == module and not x['ignore'] and not x['hidden']]
+            funcs = [x for x in types.get('module_func', []) if x['module'] == module and not x['ignore'] and not x['hidden']]
             # sort it
-            funcs.sort(key=lambda x: x['Name'])
+            funcs.sort(key=itemgetter('Name'))
             # print all functions
             for mem in funcs:
                 print(r'\%s%sRef' % (module.replace('.',''), mem['Name']), file=out)
                 print(r'\vspace{.5in}\par\rule[.5ex]{\linewidth}{1pt}\par\vspace{0.3in}', file=out)
-            classes = [x for x in self.content if x['type'] == 'module_class' and x['module'] == module and not x['ignore'] and not x['hidden']]
+            classes = [x for x in types.get('module_class', []) if x['module'] == module and not x['ignore'] and not x['hidden']]
             # print all functions
             for cls in classes:
                 print(r'\%s%sRef' % (module.replace('.', ''), cls['Name']), file=out)
                 print(r'\vspace{.5in}\par\rule[.5ex]{\linewidth}{1pt}\par\vspace{0.3in}', file=out)
-        for entry in [x for x in self.content if x['type'] in ['class'] and not x['ignore'] and not x['hidden']]:
+        for entry in [x for x in types.get('class', []) if not x['ignore'] and not x['hidden']]:
              print(r'\%sRef' % self.latexName(entry['Name'].replace('simuPOP::', '', 1).replace('.','')), file=out)
              print(r'\vspace{.1in}\par\rule[.3ex]{\linewidth}{1pt}\par\vspace{0.1in}', file=out)
         print(r'\end{document}', file=out)
@@ -1365,14 +1364,16 @@ xleftmargin=15pt}
         if type == 'reST':
             self.write_reST(output)
             return
-        fout = open(output, 'w')
+        # collect output in memory and write the file in one go
+        buf = io.StringIO()
         if type == 'swig':
-            self.write_swig(fout)
+            self.write_swig(buf)
         elif type == 'latex_single':
-            self.write_latex(fout)
+            self.write_latex(buf)
         elif type == 'latex_all':
-            self.write_latex_testfile(fout, ref_file)
-        fout.close()
+            self.write_latex_testfile(buf, ref_file)
+        with open(output, 'w') as fout:
+            fout.write(buf.getvalue())
 
        
 if __name__ == '__main__':
@@ -1445,7 +1446,8 @@ if __name__ == '__main__':
     #
     print('Writing latex reference file to', latex_file)
     p.write(latex_file, type='latex_single')
-    p.uniqueName = []
+    p.uniqueName = set()
+    p.nameCount = {}
     #
     # list of classes and functions....
     #
@@ -1486,7 +1488,8 @@ if __name__ == '__main__':
         os.mkdir(builddir)
     p.write(builddir, type='reST')
     # clear unique name
-    p.uniqueName = []
+    p.uniqueName = set()
+    p.nameCount = {}
     print('Writing latex test file to', latex_testfile)
     p.write(latex_testfile, type='latex_all', ref_file=latex_file)
     # generating sample document
@@ -7,6 +7,8 @@
     :license: BSD.
 """
 
+from __future__ import print_function
+
 import sys
 import os, re
 
@@ -18,6 +20,36 @@ import shutil
 import codecs
 from os import path
 
+# The tokenizer/parser/writer are pure Python recursive descent code that
+# spends most of its time in interpreter dispatch. If SIMUCYTHON is set,
+# the converter package is compiled with Cython and imported from the
+# build directory. Otherwise, or if the compilation fails, the pure Python
+# modules are used.
+def compile_converter():
+    '''Compile the modules of the converter package to doc/build/cython and
+    put the compiled package ahead of the pure Python one on sys.path.'''
+    from Cython.Build import cythonize
+    from setuptools import Distribution
+    tools = path.dirname(path.abspath(__file__))
+    src = path.join(tools, 'converter')
+    build = path.join(path.dirname(tools), 'build', 'cython')
+    exts = cythonize([path.join(src, '*.py')],
+        exclude=[path.join(src, '__init__.py')],
+        build_dir=path.join(build, 'src'), language_level=2, quiet=True)
+    cmd = Distribution({'ext_modules': exts}).get_command_obj('build_ext')
+    cmd.build_lib = build
+    cmd.build_temp = path.join(build, 'temp')
+    cmd.ensure_finalized()
+    cmd.run()
+    shutil.copy(path.join(src, '__init__.py'), path.join(build, 'converter'))
+    sys.path.insert(0, build)
+
+if os.getenv('SIMUCYTHON') is not None:
+    try:
+        compile_converter()
+    except Exception as e:
+        print('Failed to compile the converter with Cython, using pure Python: %s' % e)
+
 from converter.tokenizer import Tokenizer
 from converter.latexparser import DocParser
 from converter.restwriter import RestWriter
@@ -42,52 +74,34 @@ class MyDocParser(DocParser):
         DocParser.__init__(self, *args, **kwargs)
 
 
-    def mk_metadata_handler(self, name, mdname=None, arg='M'):
-        if mdname is None:
-            mdname = name
-        def handler(self):
-            data = self.parse_args('\\'+name, arg)
-            self.rootnode.params[mdname] = data[0]
-            return EmptyNode()
-        return handler
-
-    handle_color = mk_metadata_handler(None, 'color', None, 'M')
-    handle_lstset = mk_metadata_handler(None, 'lstset')
-    handle_setcounter = mk_metadata_handler(None, 'setcounter', None, 'MM')
-    handle_hypersetup = mk_metadata_handler(None, 'hypersetup')
-    handle_definecolor = mk_metadata_handler(None, 'definecolor', None, 'MMM')
-    handle_sectionfont = mk_metadata_handler(None, 'sectionfont', None, 'O')
-    handle_subsectionfont = mk_metadata_handler(None, 'subsectionfont', None, 'O')
-    handle_subsubsectionfont = mk_metadata_handler(None, 'subsubsectionfont', None, 'O')
-    handle_makeatother = mk_metadata_handler(None, 'makeatother', None, 'O')
-    handle_totalheight = mk_metadata_handler(None, 'totalheight', None, 'O')
-    handle_columnwidth = mk_metadata_handler(None, 'columnwidth', None, 'O')
-    handle_vspace = mk_metadata_handler(None, 'vspace', None, 'M')
-    handle_hspace = mk_metadata_handler(None, 'hspace', None, 'M')
-    handle_hrule = mk_metadata_handler(None, 'hrule', None, 'O')
-    handle_lstlistoflistings = mk_metadata_handler(None, 'lstlistoflistings', None, 'O')
-    handle_centering = mk_metadata_handler(None, 'centering', None, 'M')
-    handle_textwidth = mk_metadata_handler(None, 'textwidth', None, 'O')
-    handle_end = mk_metadata_handler(None, 'end', None, 'O')
-    handle_textendash = mk_metadata_handler(None, 'textendash', None, 'O')
-
-    #handle_item = mk_metadata_handler(None, 'item', None, 'O')
-    handle_textmd = mk_metadata_handler(None, 'textmd', None, 'O')
-    handle_normalsize = mk_metadata_handler(None, 'normalsize', None, 'O')
-    handle_textcompwordmark = mk_metadata_handler(None, 'textcompwordmark', None, 'O')
-    handle_citep = mk_metadata_handler(None, 'citep', None, 'O')
-    handle_citet = mk_metadata_handler(None, 'citet', None, 'O')
-    handle_citeyearpar = mk_metadata_handler(None, 'citeyearpar', None, 'O')
-    handle_bibliographystyle = mk_metadata_handler(None, 'bibliographystyle', None, 'O')
-    handle_bibliography = mk_metadata_handler(None, 'bibliography', None, 'O')
-    handle_printindex = mk_metadata_handler(None, 'printindex', None, 'O')
+    # Commands that are parsed and then ignored. Their argument, read with
+    # the given argument spec, is saved to rootnode.params.
+    metadata_commands = {
+        'bf': 'O', 'bibliography': 'O', 'bibliographystyle': 'O',
+        'centering': 'M', 'citep': 'O', 'citet': 'O', 'citeyearpar': 'O',
+        'color': 'M', 'columnwidth': 'O', 'definecolor': 'MMM', 'end': 'O',
+        'hfill': 'O', 'hrule': 'O', 'hspace': 'M', 'hypersetup': 'M',
+        'lstlistingname': 'O', 'lstlistlistingname': 'O',
+        'lstlistoflistings': 'O', 'lstset': 'M', 'lyxline': 'O',
+        'makeatletter': 'O', 'makeatother': 'O', 'normalsize': 'O',
+        'par': 'O', 'printindex': 'O', 'rule': 'O', 'sectionfont': 'O',
+        'setcounter': 'MM', 'slshape': 'O', 'sloppy': 'O', 'small': 'O',
+        'subsectionfont': 'O', 'subsubsectionfont': 'O',
+        'textcompwordmark': 'O', 'textendash': 'O', 'textmd': 'O',
+        'textsf': 'O', 'textwidth': 'O', 'totalheight': 'O',
+        'ttfamily': 'O', 'vspace': 'M',
+    }
 
     def handle_minipage_env(self):
-        # Ignore the minipage part.
-        txt = ''
-        while not txt.endswith('end{minipage}'):
-            nextl, nextt, nextv, nextr = self.tokens.pop()
-            txt += nextv
+        # Ignore the minipage part, that is everything up to the tokens
+        # \end, { and minipage.
+        pop = self.tokens.pop
+        prev2 = prev1 = ''
+        while True:
+            nextv = pop()[2]
+            if nextv == 'minipage' and prev1 == '{' and prev2 == 'end':
+                break
+            prev2, prev1 = prev1, nextv
         return EmptyNode()
 
     def handle_include(self):
@@ -95,19 +109,19 @@ class MyDocParser(DocParser):
         return EmptyNode()
 
     def handle_newenvironment(self, numOpt=3):
-        txt = ''
+        # skip numOpt top level {} groups, looking only at the raw text
+        # of each token and with the pop method bound outside of the loop
+        pop = self.tokens.pop
         opt = 0
         depth = 0
-        while True:
-            nextl, nextt, nextv, nextr = self.tokens.pop()
+        while opt != numOpt:
+            nextr = pop()[3]
             if nextr == '{' or nextr == '[':
                 depth += 1
             elif nextr == '}' or nextr == ']':
                 depth -= 1
-            if nextr == '}' and depth == 0:
-                opt += 1
-            if opt == numOpt:
-                break
+                if depth == 0 and nextr == '}':
+                    opt += 1
         return EmptyNode()
 
     def handle_newcommand(self):
@@ -120,97 +134,190 @@ class MyDocParser(DocParser):
         return handler
 
 
-    handle_small = mk_metadata_handler(None, '\\small', None, 'O')
-    handle_ttfamily = mk_metadata_handler(None, '\\small', None, 'O')
-    handle_textsf = mk_metadata_handler(None, '\\textsf', None, 'O')
-    handle_slshape = mk_metadata_handler(None, '\\small', None, 'O')
-    handle_bf = mk_metadata_handler(None, '\\small', None, 'O')
-    handle_makeatletter = mk_metadata_handler(None, 'makeatletter', None, 'O')
-    handle_lyxline = mk_metadata_handler(None, 'lyxline', None, 'O')
-    handle_par = mk_metadata_handler(None, 'par', None, 'O')
-    handle_rule = mk_metadata_handler(None, 'rule', None, 'O')
-    handle_hfill = mk_metadata_handler(None, 'hfill', None, 'O')
-    handle_sloppy = mk_metadata_handler(None, 'sloppy', None, 'O')
-    handle_lstlistingname = mk_metadata_handler(None, 'lstlistingname', None, 'O')
-    handle_lstlistlistingname = mk_metadata_handler(None, 'lstlistlistingname', None, 'O')
+def mk_metadata_handler(name, arg):
+    '''Return a handler that parses command name with argument spec arg
+    and saves its argument to rootnode.params.'''
+    cmd = '\\' + name
+    def handler(self):
+        self.rootnode.params[name] = self.parse_args(cmd, arg)[0]
+        return EmptyNode()
+    return handler
+
+# install handle_XXX for all metadata commands, overriding handlers that
+# DocParser may define for them
+for _cmd, _arg in MyDocParser.metadata_commands.items():
+    setattr(MyDocParser, 'handle_' + _cmd, mk_metadata_handler(_cmd, _arg))
+
+
+# content of included files, keyed by the directory of the input file and
+# the name of the included file. Files that are not found are not recorded
+# because they can be written to build later.
+_included_files = {}
+
+# names in the directories that are searched for included files
+_dir_entries = {}
+
+def dir_entries(dir):
+    '''Return the set of names in dir, listing it only once.'''
+    if dir not in _dir_entries:
+        try:
+            _dir_entries[dir] = frozenset(os.listdir(dir))
+        except OSError:
+            _dir_entries[dir] = frozenset()
+    return _dir_entries[dir]
+
+def read_include(dirname, file):
+    '''Return the content of file, which is looked for, with a few
+    suffixes, in the current directory, dirname and build. Return None if
+    the file cannot be found. Each file is read only once.'''
+    key = (dirname, file)
+    if key not in _included_files:
+        for dir in ['.', dirname, 'build']:
+            for suffix in ['', '.ref', '.rst', '.txt']:
+                filename = os.path.join(dir, file + suffix)
+                head, tail = os.path.split(filename)
+                if tail in dir_entries(head or '.') and os.path.isfile(filename):
+                    # included files such as the .ref files of doxy2swig
+                    # are utf-8 text, only the LyX-exported .tex input is
+                    # latin1
+                    with open(filename, 'rb') as inc:
+                        _included_files[key] = inc.read().decode('utf-8')
+                    return _included_files[key]
+        return None
+    return _included_files[key]
 
 
 class MyRestWriter(RestWriter):
     def __init__(self, dir = '.', auto_keywords = {}, *args, **kwargs):
+        # If given, chapter_file(ch, sec) opens the output file of chapter
+        # ch (sec=0) or of its section sec, and returns the file and its name
+        # relative to the output directory. Chapters and sections are then
+        # written directly to their files instead of being kept in memory.
+        self.chapter_file = kwargs.pop('chapter_file', None)
+        self.chapter_names = []
         RestWriter.__init__(self, *args, **kwargs)
         self.dirname = dir
         if self.dirname == '':
             self.dirname = '.'
         self.auto_keywords = auto_keywords
+        # rendered :ref: role of each label, documents refer to the same
+        # labels many times
+        self.ref_cache = {}
+
+    def new_chapter(self):
+        """ Open the file of a new chapter and set self.fp to it. """
+        if self.chapter_file is None:
+            return RestWriter.new_chapter(self)
+        self.close_chapter()
+        new_fp, name = self.chapter_file(len(self.chapters), 0)
+        self.chapter_names.append(name)
+        self.chapters.append([new_fp])
+        self.fp = new_fp
+
+    def new_section(self):
+        """ Open the file of a new section, add it to the toctree of
+            its chapter and set self.fp to it. """
+        if self.chapter_file is None or len(self.chapters) == 1:
+            return RestWriter.new_section(self)
+        chapter = self.chapters[-1]
+        if len(chapter) == 1:
+            chapter[0].write('\n.. toctree::\n\n')
+        else:
+            chapter[-1].close()
+        new_fp, name = self.chapter_file(len(self.chapters) - 1, len(chapter))
+        chapter[0].write('   %s\n' % name)
+        chapter.append(new_fp)
+        self.fp = new_fp
+
+    def close_chapter(self):
+        """ Close the files of the current chapter and its sections. """
+        if self.chapter_file is not None and len(self.chapters) > 1:
+            for fp in self.chapters[-1]:
+                fp.close()
+
+    def inline_include(self, node):
+        file = node.args
+        txt = read_include(self.dirname, file)
+        if txt is None:
+            print('Warning: Failed to find included file for filename "%s".' % file)
+        else:
+            self.write(txt)
+
+    def inline_ref(self, node):
+        label = text(node.args[0])
+        if label not in self.ref_cache:
+            ref_text = label.replace(':', '_').replace('-', '_')
+            self.ref_cache[label] = ':ref:`%s <%s%s>`' % (ref_text, self.labelprefix, ref_text)
+        self.curpar.append(self.ref_cache[label])
+
+    def inline_code(self, node):
+        self.inline_keyword(node, '``')
+
+    def inline_strong(self, node):
+        self.inline_keyword(node, '**')
+
+    def inline_keyword(self, node, sym):
+        """ Write code and strong text that names a keyword in
+            self.auto_keywords as a reference to it. """
+        cnt = self.get_textonly_node(node.args[0], 'code', warn=1)
+        if isinstance(cnt, TextNode):
+            for keyword in self.auto_keywords.keys():
+                txt = text(cnt).split('(')[0]
+                leftover = text(cnt)[len(txt):]
+                match = False
+                if txt in self.auto_keywords[keyword]:
+                    self.curpar.append(':%s:`%s`' % (keyword, txt))
+                    match = True
+                elif '.' in txt:
+                    ends = [x.endswith(txt) for x in self.auto_keywords[keyword]]
+                    if True in ends:
+                        fullword = self.auto_keywords[keyword][ends.index(True)]
+                        self.curpar.append(':%s:`~%s`' % (keyword, fullword))
+                        match = True
+                if match:
+                    if leftover != '':
+                        if leftover.startswith('()'):
+                            # sphinx ignores them!!
+                            self.curpar.append("()")
+                            if len(leftover) > 2:
+                                self.curpar.append("%s%s%s" % (sym, leftover[2:], sym))
+                        elif leftover.startswith('(') and leftover.endswith(')'):
+                            self.curpar.append("(%s%s%s)" % (sym, leftover[1:-1], sym))
+                        else:
+                            self.curpar.append("%s%s%s" % (sym, leftover, sym))
+                    return
+        # the regular emph/strong case
+        RestWriter.visit_InlineNode(self, node)
+
+    # inline commands handled here, others are left to RestWriter
+    inline_handlers = {
+        'include': inline_include,
+        'ref': inline_ref,
+        'code': inline_code, 'bfcode': inline_code, 'samp': inline_code,
+        'texttt': inline_code, 'regexp': inline_code,
+        'strong': inline_strong, 'textbf': inline_strong,
+    }
 
     def visit_InlineNode(self, node):
-        cmdname = node.cmdname
         if not node.args:
-            self.curpar.append(self.simplecmd_mapping[cmdname])
-            return
-        content = node.args[0]
-        if cmdname == 'include':
-            file = node.args
-            for dir in ['.', self.dirname, 'build']:
-                for suffix in ['', '.ref', '.rst', '.txt']:
-                    filename = os.path.join(dir, file + suffix)
-                    if os.path.isfile(filename):
-                        txt = open(filename).read()
-                        self.write(txt)
-                        return
-            print 'Warning: Failed to find included file for filename "%s".' % file
+            self.curpar.append(self.simplecmd_mapping[node.cmdname])
             return
-        sym = ''
-        if cmdname in ('code', 'bfcode', 'samp', 'texttt', 'regexp'):
-            sym = '``'
-        elif cmdname in ('strong', 'textbf'):
-            sym = '**'
-        if sym != '':
-            cnt = self.get_textonly_node(content, 'code', warn=1)
-            done = False
-            if isinstance(cnt, TextNode):
-                for keyword in self.auto_keywords.keys():
-                    txt = text(cnt).split('(')[0]
-                    leftover = text(cnt)[len(txt):]
-                    match = False
-                    if txt in self.auto_keywords[keyword]:
-                        self.curpar.append(':%s:`%s`' % (keyword, txt))
-                        match = True
-                    elif '.' in txt:
-                        ends = [x.endswith(txt) for x in self.auto_keywords[keyword]]
-                        if True in ends:
-                            fullword = self.auto_keywords[keyword][ends.index(True)]
-                            self.curpar.append(':%s:`~%s`' % (keyword, fullword))
-                            match = True
-                    if match:
-                        if leftover != '':
-                            if leftover.startswith('()'):
-                                # sphinx ignores them!!
-                                self.curpar.append("()")
-                                if len(leftover) > 2:
-                                    self.curpar.append("%s%s%s" % (sym, leftover[2:], sym))
-                            elif leftover.startswith('(') and leftover.endswith(')'):
-                                self.curpar.append("(%s%s%s)" % (sym, leftover[1:-1], sym))
-                            else:
-                                self.curpar.append("%s%s%s" % (sym, leftover, sym))
-                        return
-        # the regular emph/strong case and other stuff
-        RestWriter.visit_InlineNode(self, node)
+        self.inline_handlers.get(node.cmdname, RestWriter.visit_InlineNode)(self, node)
 
     def visit_CommentNode(self, node):
         # no inline comments -> they are all output at the start of a new paragraph
         pass #self.comments.append(node.comment.strip())
 
-    def visit_CommandNode(self, node):
-        cmdname = node.cmdname
-        if cmdname == 'example_url':
-            file = text(node.args[0])
-            file = file.replace('.log', '.py')
-            # get the file
-            txt = open(file).read()
-            outfilename = os.path.split(file)[-1]
-            with open(os.path.join('build', outfilename), 'w') as outfile:
-                print >> outfile, '''#!/usr/bin/env python
+    def command_example_url(self, node):
+        file = text(node.args[0])
+        file = file.replace('.log', '.py')
+        # get the file
+        txt = open(file).read()
+        outfilename = os.path.split(file)[-1]
+        # build is listed by dir_entries and gains a file
+        _dir_entries.pop('build', None)
+        with open(os.path.join('build', outfilename), 'w') as outfile:
+            print('''#!/usr/bin/env python
 
 #
 # $File: %s $
@@ -239,59 +346,101 @@ class MyRestWriter(RestWriter):
 # the user's guide (https://github.com/BoPeng/simuPOP/manual) for a detailed
 # description of this example.
 #
-''' % outfilename
-                print >> outfile, txt
-            # insert a URL
-            self.write('`Download %s <%s>`_\n' % (outfilename, outfilename))
-        else:
-            RestWriter.visit_CommandNode(self, node)
+''' % outfilename, file=outfile)
+            print(txt, file=outfile)
+        # insert a URL
+        self.write('`Download %s <%s>`_\n' % (outfilename, outfilename))
+
+    # commands handled here, others are left to RestWriter
+    command_handlers = {
+        'example_url': command_example_url,
+    }
+
+    def visit_CommandNode(self, node):
+        self.command_handlers.get(node.cmdname, RestWriter.visit_CommandNode)(self, node)
+
+if sys.version_info[0] >= 3:
+    def open_output(filename):
+        """ Open a .rst file for writing, through the buffered C
+            implementation of io. """
+        return open(filename, 'w', encoding='utf-8')
+else:
+    # io.open only accepts unicode, but the writers also write str
+    def open_output(filename):
+        """ Open a .rst file for writing. """
+        return codecs.open(filename, 'w', 'utf-8')
+
 
 def convert_file(infile, outfile, doraise=True, splitchap=True,
                  toctree=None, deflang=None, labelprefix=''):
-    inf = codecs.open(infile, 'r', 'latin1')
-    p = MyDocParser(Tokenizer(inf.read()).tokenize(), infile)
+    # latin1 maps bytes to unicode one to one, so a single decode of the
+    # whole file is much faster than reading through a codecs stream
+    with open(infile, 'rb') as inf:
+        data = inf.read().decode('latin1')
+    p = MyDocParser(Tokenizer(data).tokenize(), infile)
     if not splitchap:
-        outf = codecs.open(outfile, 'w', 'utf-8')
+        outf = open_output(outfile)
+        chapter_file = None
     else:
         outf = None
+        dir = path.dirname(outfile)
+        if dir == '':
+            dir = '.'
+        prefix = dir + '/'
+        basename = path.basename(outfile)
+        def chapter_file(ch, sec):
+            if sec == 0:
+                name = basename.replace('.rst', '_ch%d.rst' % ch)
+            else:
+                name = basename.replace('.rst', '_ch%d_sec%d.rst' % (ch, sec))
+            return open_output(prefix + name), name
     refFile = os.path.join(os.path.dirname(infile), 'reflist.py')
     if os.path.isfile(refFile):
-        execfile(refFile, globals(), globals())
-    r = MyRestWriter(os.path.dirname(infile), auto_keywords, outf, splitchap, toctree, deflang, labelprefix)
+        with open(refFile) as ref:
+            exec(compile(ref.read(), refFile, 'exec'), globals(), globals())
+    r = MyRestWriter(os.path.dirname(infile), auto_keywords, outf, splitchap, toctree, deflang, labelprefix,
+        chapter_file=chapter_file)
     try:
         r.write_document(p.parse())
+        p.finish()
+        # the parser keeps the document tree through its root node, release
+        # it before writing the table of contents
+        del p
         if splitchap:
-            outf = codecs.open(outfile, 'w', 'utf-8')
+            r.close_chapter()
+            outf = open_output(outfile)
             outf.write('.. toctree::\n   \n') #    :numbered:\n   \n')
-            for ch,chapter in enumerate(r.chapters[1:]):
-                dir = path.dirname(outfile)
-                if dir == '':
-                    dir = '.'
-                chtoc = '%s/%s' % (dir, path.basename(outfile))
-                chtoc = chtoc.replace('.rst', '_ch%d.rst' % (ch+1))
-                outf.write('   %s\n' % chtoc[len('%s/' % dir):])
-                choutf = codecs.open(chtoc, 'w', 'utf-8')
-                choutf.write(chapter[0].getvalue())
-                if len(chapter) > 1:
-                    choutf.write('\n.. toctree::\n\n')
-                    for sec,section in enumerate(chapter[1:]):
-                        filename = '%s/%s' % (dir, path.basename(outfile))
-                        filename = filename.replace('.rst', '_ch%d_sec%d.rst' % (ch + 1, sec + 1))
-                        sec_outf = codecs.open(filename, 'w', 'utf-8')
-                        sec_outf.write(section.getvalue())
-                        sec_outf.close()
-                        choutf.write('   %s\n' % filename[len('%s/' % dir):])
-                choutf.close()
-            outf.close()
-        else:
-            outf.close()
-        p.finish()
+            for name in r.chapter_names:
+                outf.write('   %s\n' % name)
+        outf.close()
         return 1, r.warnings
-    except Exception, err:
+    except Exception as err:
         if doraise:
             raise
         return 0, str(err)
 
 
+def _convert_pair(files):
+    return convert_file(*files)
+
+
+def convert_files(files):
+    '''Convert a list of (infile, outfile) pairs. The documents do not share
+    any state so they are converted in parallel processes.'''
+    import multiprocessing
+    pool = multiprocessing.Pool(min(len(files), multiprocessing.cpu_count()))
+    try:
+        return pool.map(_convert_pair, files)
+    finally:
+        pool.close()
+        pool.join()
+
+
 if __name__ == '__main__':
-    convert_file(*sys.argv[1:])
+    args = sys.argv[1:]
+    # convert.py in1.tex out1.rst in2.tex out2.rst ...
+    if len(args) > 2 and len(args) % 2 == 0 and \
+        all(x.endswith('.tex') for x in args[::2]):
+        convert_files(list(zip(args[::2], args[1::2])))
+    else:
+        convert_file(*args)